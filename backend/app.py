@@ -1,106 +1,533 @@
 """
 Flask backend for ACM Skill Prep - Connects to NeonDB PostgreSQL
 """
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
+from whitenoise import WhiteNoise
+import orjson
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values, register_default_json, register_default_jsonb
 from psycopg2 import pool
 import os
 from dotenv import load_dotenv
+from cachetools import TTLCache
+import threading
 import time
+import hashlib
+import re
+import select
+import io
+import csv
 from datetime import datetime, timedelta, timezone
-from functools import wraps
-import signal
+from contextlib import contextmanager
 # Load environment variables from backend/.env
 load_dotenv()
 
 # Set up paths for frontend folder
 FRONTEND_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'frontend')
 
-app = Flask(__name__, static_folder=FRONTEND_FOLDER, static_url_path='')
+# Fingerprinted static files (e.g. main.3f2a9c1e.js) never change under the same name
+HASHED_ASSET_RE = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson - faster encoding, native datetime support"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS), mimetype='application/json'
+        )
+
+# Static files are served by WhiteNoise below, so Flask's own static route is disabled
+app = Flask(__name__, static_folder=None)
+app.json = ORJSONProvider(app)  # jsonify() and request.json now go through orjson
 CORS(app)
 app.config['JSON_SORT_KEYS'] = False
 
+# Compress API responses (brotli, falling back to gzip). Streamed responses - i.e. index.html
+# from send_file - are left alone so their own ETag revalidation keeps working
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
+
+# Serve the frontend straight from WSGI, before Flask routing. Files are indexed once at
+# startup; the .br/.gz variants written by `python -m whitenoise.compress` at build time are
+# picked automatically. Unhashed files are revalidated on every load (max_age=0), fingerprinted
+# ones are cached forever. autorefresh re-scans the folder when running app.py directly
+app.wsgi_app = WhiteNoise(
+    app.wsgi_app, root=FRONTEND_FOLDER, prefix='', max_age=0,
+    immutable_file_test=lambda path, url: bool(HASHED_ASSET_RE.search(url)),
+    autorefresh=__name__ == '__main__',
+)
+
 DATABASE_URL = os.getenv('DATABASE_URL')
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')  # Change this in production!
 
-# Request timeout decorator for API endpoints (max 10 seconds)
-def timeout_handler(signum, frame):
-    raise TimeoutError("Request timeout")
-
-def timeout(seconds=10):
-    """Decorator to add timeout protection to endpoints"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Note: Signal-based timeouts only work on Unix
-            # For Windows compatibility, we'll just log the decorator exists
-            try:
-                return func(*args, **kwargs)
-            except TimeoutError:
-                return jsonify({'error': 'Request timeout'}), 504
-        return wrapper
-    return decorator
-
-# Connection pooling (min 10, max 25 connections for 100+ concurrent users)
-# Use connect_timeout to prevent hanging on unreachable database
+class AppConnection(psycopg2.extensions.connection):
+    """Connection that remembers whether PREPARED_STATEMENTS have been run on it"""
+    prepared = False
+
+# ==================== SQL ====================
+# Queries live here as bytes constants, which psycopg2 sends without re-encoding.
+# Fragments shared by several statements are defined once and concatenated at import
+
+# Full problem rows with their samples aggregated per problem via LATERAL
+# (filters problems first, then hits idx_samples_problem_id_id - no wide GROUP BY)
+SQL_SELECT_PROBLEMS_WITH_SAMPLES = b"""
+    SELECT 
+        p.id, p.title, p.origin, p.time_limit, p.memory_limit, 
+        p.statement, p.input, p.output, p.constraints, p.note, p.vj_link,
+        COALESCE(s.samples_json, '[]'::jsonb) as samples_json
+    FROM problems p
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(
+            jsonb_build_object('input', input, 'output', output) ORDER BY id
+        ) AS samples_json
+        FROM samples WHERE problem_id = p.id
+    ) s ON true
+"""
+
+# Hot-path queries PREPAREd once per connection so Postgres skips parse/plan on every call.
+# Prepared statements live for the whole session and survive rollbacks.
+PREPARED_STATEMENTS = b"PREPARE get_problem_v1 (text) AS" + SQL_SELECT_PROBLEMS_WITH_SAMPLES + b"""\
+    WHERE p.id = $1;
+"""
+
+SQL_LIST_PROBLEMS = b"SELECT id, title, origin, time_limit, memory_limit FROM problems ORDER BY id"
+
+SQL_EXECUTE_GET_PROBLEM = b"EXECUTE get_problem_v1 (%s)"
+
+# Unprepared equivalent, used behind transaction-mode poolers
+SQL_GET_PROBLEM = SQL_SELECT_PROBLEMS_WITH_SAMPLES + b"""\
+    WHERE p.id = %s
+"""
+
+SQL_GET_PROBLEMS_BATCH = SQL_SELECT_PROBLEMS_WITH_SAMPLES + b"""\
+    WHERE p.id = ANY(%s)
+    ORDER BY p.id
+"""
+
+SQL_COUNT_PROBLEMS = b"SELECT COUNT(*) as count FROM problems"
+
+SQL_GET_CONTEST_PASSWORD = b"SELECT password FROM contest_password WHERE id = 1"
+
+# Insert-or-replace a problem; the single and bulk upserts differ only in their VALUES clause
+SQL_INSERT_PROBLEM = b"""
+    INSERT INTO problems (id, title, origin, time_limit, memory_limit, statement, input, output, constraints, note, vj_link)
+"""
+
+SQL_ON_CONFLICT_REPLACE_PROBLEM = b"""
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title,
+        origin = EXCLUDED.origin,
+        time_limit = EXCLUDED.time_limit,
+        memory_limit = EXCLUDED.memory_limit,
+        statement = EXCLUDED.statement,
+        input = EXCLUDED.input,
+        output = EXCLUDED.output,
+        constraints = EXCLUDED.constraints,
+        note = EXCLUDED.note,
+        vj_link = EXCLUDED.vj_link
+"""
+
+SQL_UPSERT_PROBLEM = (
+    SQL_INSERT_PROBLEM
+    + b"    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    + SQL_ON_CONFLICT_REPLACE_PROBLEM
+)
+
+SQL_DELETE_SAMPLES = b"DELETE FROM samples WHERE problem_id = %s"
+
+SQL_INSERT_SAMPLES = b"""
+    INSERT INTO samples (problem_id, input, output) VALUES %s
+"""
+
+SQL_UPSERT_PROBLEMS = SQL_INSERT_PROBLEM + b"    VALUES %s" + SQL_ON_CONFLICT_REPLACE_PROBLEM
+
+SQL_DELETE_SAMPLES_FOR_PROBLEMS = b"DELETE FROM samples WHERE problem_id = ANY(%s)"
+
+SQL_COPY_SAMPLES = b"COPY samples (problem_id, input, output) FROM STDIN WITH (FORMAT csv)"
+
+# Update a problem and replace its samples in one round-trip. Samples arrive as two
+# parallel arrays (inputs, outputs); the statement returns one row only if the problem
+# exists, and that row's pg_notify queues the cross-worker cache invalidation
+SQL_UPDATE_PROBLEM = b"""
+    WITH upd AS (
+        UPDATE problems SET 
+            title = %s, origin = %s, time_limit = %s, memory_limit = %s,
+            statement = %s, input = %s, output = %s, constraints = %s, 
+            note = %s, vj_link = %s
+        WHERE id = %s
+        RETURNING id
+    ), del AS (
+        DELETE FROM samples WHERE problem_id IN (SELECT id FROM upd)
+    ), ins AS (
+        INSERT INTO samples (problem_id, input, output)
+        SELECT upd.id, s.input, s.output
+        FROM upd, unnest(%s::text[], %s::text[]) WITH ORDINALITY AS s(input, output, n)
+        ORDER BY s.n
+    )
+    SELECT pg_notify('cache_invalidate', id) FROM upd
+"""
+
+SQL_DELETE_PROBLEM = b"DELETE FROM problems WHERE id = %s"
+
+# Cross-worker cache invalidation: one notification per problem id, delivered on commit
+SQL_LISTEN_INVALIDATE = b"LISTEN cache_invalidate"
+
+SQL_NOTIFY_INVALIDATE = b"SELECT pg_notify('cache_invalidate', id) FROM unnest(%s::text[]) AS id"
+
+SQL_CONTEST_STATUS = b"""
+    SELECT status,
+        GREATEST(0, FLOOR(EXTRACT(EPOCH FROM
+            CASE status
+                WHEN 'pending' THEN start_time - NOW()
+                WHEN 'running' THEN end_time - NOW()
+                ELSE INTERVAL '0'
+            END)))::int AS remaining_time,
+        is_visible, total_duration_minutes
+    FROM contest_state WHERE id = 1
+"""
+
+SQL_CONTEST_LAST_UPDATE = b"""
+    WITH cur AS (
+        SELECT status, start_time, end_time, updated_at
+        FROM contest_state WHERE id = 1
+    ), next_state AS (
+        SELECT CASE
+            WHEN status = 'pending' AND start_time <= NOW() THEN 'running'
+            WHEN status = 'running' AND end_time <= NOW() THEN 'ended'
+            ELSE status
+        END AS status
+        FROM cur
+    ), locked AS (
+        SELECT contest_state.id
+        FROM contest_state, next_state
+        WHERE contest_state.id = 1 AND contest_state.status <> next_state.status
+        FOR NO KEY UPDATE OF contest_state SKIP LOCKED
+    ), upd AS (
+        UPDATE contest_state
+        SET status = next_state.status, updated_at = NOW()
+        FROM next_state, locked
+        WHERE contest_state.id = locked.id
+        RETURNING EXTRACT(EPOCH FROM contest_state.updated_at) AS ts
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM cur) AS found,
+        EXISTS (SELECT 1 FROM upd) AS updated,
+        COALESCE((SELECT ts FROM upd),
+                 (SELECT EXTRACT(EPOCH FROM updated_at) FROM cur)) AS timestamp
+"""
+
+SQL_SCHEDULE_CONTEST = b"""
+    INSERT INTO contest_state (id, status, start_time, end_time, total_duration_minutes, is_visible, updated_at)
+    VALUES (1, 'pending', %s, %s, %s, FALSE, NOW())
+    ON CONFLICT (id) DO UPDATE
+    SET status = 'pending', start_time = %s, end_time = %s, 
+        total_duration_minutes = %s, updated_at = NOW()
+"""
+
+SQL_START_CONTEST = b"""
+    INSERT INTO contest_state (id, status, start_time, end_time, total_duration_minutes, is_visible, updated_at)
+    VALUES (1, 'running', %s, %s, %s, FALSE, NOW())
+    ON CONFLICT (id) DO UPDATE
+    SET status = 'running', start_time = %s, end_time = %s, 
+        total_duration_minutes = %s, updated_at = NOW()
+"""
+
+SQL_GET_CONTEST_END = b"SELECT end_time, total_duration_minutes FROM contest_state WHERE id = 1"
+
+SQL_EXTEND_CONTEST = b"""
+    UPDATE contest_state 
+    SET end_time = %s, total_duration_minutes = %s, updated_at = NOW()
+    WHERE id = 1
+"""
+
+SQL_GET_CONTEST_START = b"SELECT status, start_time FROM contest_state WHERE id = 1"
+
+SQL_DELAY_CONTEST_START = b"""
+    UPDATE contest_state 
+    SET start_time = %s, updated_at = NOW()
+    WHERE id = 1
+"""
+
+SQL_STOP_CONTEST = b"""
+    INSERT INTO contest_state (id, status, end_time, updated_at)
+    VALUES (1, 'ended', NOW(), NOW())
+    ON CONFLICT (id) DO UPDATE
+    SET status = 'ended', end_time = NOW(), updated_at = NOW()
+"""
+
+SQL_SET_CONTEST_VISIBILITY = b"""
+    INSERT INTO contest_state (id, is_visible, updated_at)
+    VALUES (1, %s, NOW())
+    ON CONFLICT (id) DO UPDATE
+    SET is_visible = %s, updated_at = NOW()
+"""
+
+SQL_RESET_CONTEST = b"""
+    INSERT INTO contest_state (id, status, start_time, end_time, total_duration_minutes, is_visible, updated_at)
+    VALUES (1, 'pending', NULL, NULL, 0, FALSE, NOW())
+    ON CONFLICT (id) DO UPDATE
+    SET status = 'pending', start_time = NULL, end_time = NULL, 
+        total_duration_minutes = 0, is_visible = FALSE, updated_at = NOW()
+"""
+
+# Connection settings passed to every psycopg2.connect() on top of DATABASE_URL
+DB_CONNECT_KWARGS = {
+    # Fail fast instead of hanging on an unreachable database
+    'connect_timeout': 5,
+    # TCP keepalives stop Neon from silently dropping idle pooled connections
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    # Server-side limits so a slow query or abandoned transaction can't hold a pooled
+    # connection forever (4s per statement, 10s idle inside a transaction).
+    # timezone=UTC: contest times are stored as naive UTC TIMESTAMPs and compared with NOW(),
+    # which Postgres does in the session time zone
+    'options': '-c statement_timeout=4000 -c idle_in_transaction_session_timeout=10000 -c timezone=UTC',
+    'connection_factory': AppConnection,
+}
+
+# DATABASE_URL parsed once at import; every connect() reuses these kwargs.
+# options are merged, not replaced, so the URL's own (e.g. Neon's endpoint=...) survive -
+# they go last so any -c settings in the URL win over the defaults above
+_url_kwargs = psycopg2.extensions.parse_dsn(DATABASE_URL) if DATABASE_URL else {}
+DSN_KWARGS = {
+    **_url_kwargs, **DB_CONNECT_KWARGS,
+    'options': ' '.join(filter(None, [DB_CONNECT_KWARGS['options'], _url_kwargs.get('options')])),
+}
+
+# Transaction-mode poolers (Neon's -pooler endpoints, PgBouncer) may run each statement on a
+# different server backend, so session-level PREPARE/EXECUTE can't be relied on there
+USE_PREPARED_STATEMENTS = '-pooler' not in DSN_KWARGS.get('host', '')
+
+# LISTEN through a transaction-mode pooler succeeds but never receives notifications, so the
+# invalidation listener always connects to Neon's direct endpoint (same host minus -pooler).
+# Other poolers can't be detected - DATABASE_URL must then point at the database itself
+LISTEN_DSN_KWARGS = {**DSN_KWARGS}
+if 'host' in LISTEN_DSN_KWARGS:
+    LISTEN_DSN_KWARGS['host'] = LISTEN_DSN_KWARGS['host'].replace('-pooler.', '.')
+
+# Connection pooling (min 5, max 25 by default, tunable via DB_POOL_MIN / DB_POOL_MAX)
+# ThreadedConnectionPool is safe to share across threaded WSGI workers
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 5))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 25))
 try:
-    # Add connection timeout to prevent hanging
-    connection_url = DATABASE_URL + ("&" if "?" in DATABASE_URL else "?") + "connect_timeout=5"
-    connection_pool = pool.SimpleConnectionPool(5, 20, connection_url)  # Increased for 400+ users
-    print("✓ Connection pool initialized: 5-20 connections (optimized for 400-500 users)")
+    connection_pool = pool.ThreadedConnectionPool(
+        minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, **DSN_KWARGS
+    )
+    print(f"✓ Connection pool initialized: {DB_POOL_MIN}-{DB_POOL_MAX} connections")
 except Exception as e:
     print(f"⚠ Warning: Connection pooling failed: {e}")
     print("  Will use single connections instead")
     connection_pool = None
 
-# Simple cache
-cache = {}
-cache_timestamp = {}
+# Separate 1-2 connection pool for /api/health so liveness probes still answer
+# when the main pool is exhausted under load
+HEALTH_POOL_WAIT = 0.1  # seconds to wait for a free health connection before reporting degraded
+try:
+    HEALTH_POOL = pool.ThreadedConnectionPool(
+        minconn=1, maxconn=2, **DSN_KWARGS
+    )
+except Exception as e:
+    print(f"⚠ Warning: Health check pool failed: {e}")
+    HEALTH_POOL = None
+
+# Return json/jsonb columns as raw text so aggregated samples are spliced into
+# responses verbatim instead of being parsed here and re-serialized by Flask
+register_default_json(globally=True, loads=lambda s: s)
+register_default_jsonb(globally=True, loads=lambda s: s)
+
+# The problem list is fetched on every page load but only changes on admin edits:
+# let browsers/CDNs reuse it for a minute and serve it stale while revalidating
+PROBLEM_LIST_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=600'
+
+# Bounded TTL+LRU caches (1 hour). TTLCache is not thread-safe, so guard access with a lock
+# Entries are (body, etag) tuples of pre-serialized JSON so cache hits skip jsonify
+PROBLEM_CACHE = TTLCache(maxsize=512, ttl=3600)  # problem_id -> problem with samples
+LIST_CACHE = TTLCache(maxsize=1, ttl=3600)       # problem list view
+# Every client polls contest status; serve all polls within the same second from one DB read
+STATUS_CACHE = TTLCache(maxsize=1, ttl=1)        # serialized /api/contest/status body
+cache_lock = threading.Lock()
+
+def cache_get(store, key):
+    """Thread-safe cache lookup, returns None on miss"""
+    with cache_lock:
+        return store.get(key)
+
+def cache_set(store, key, value):
+    """Thread-safe cache insert"""
+    with cache_lock:
+        store[key] = value
+
+def make_cache_entry(text):
+    """Turn serialized JSON text into a cacheable (body, etag) pair"""
+    body = text.encode('utf-8')
+    return body, hashlib.md5(body).hexdigest()
+
+def serialize_json(obj):
+    """Serialize obj once into a cacheable (body, etag) pair"""
+    return make_cache_entry(app.json.dumps(obj))
+
+def etag_matches(etag):
+    """If-None-Match check that also accepts the ':br' / ':gzip' suffix Flask-Compress adds
+    to the ETag of compressed responses"""
+    return any(request.if_none_match.contains(etag + suffix) for suffix in ('', ':br', ':gzip'))
+
+def cached_json_response(entry, cache_control='no-cache'):
+    """Build a JSON response from a cached (body, etag) pair, answering 304 on a matching If-None-Match"""
+    body, etag = entry
+    if etag_matches(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Default: browsers keep the body but revalidate every time, so admin edits show up immediately
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def invalidate_contest_status():
+    """Drop the cached contest status after the contest row changes"""
+    with cache_lock:
+        STATUS_CACHE.clear()
+
+def invalidate_problem(problem_id):
+    """Evict a single problem and the list view after an admin write"""
+    with cache_lock:
+        PROBLEM_CACHE.pop(problem_id, None)
+        LIST_CACHE.clear()
+
+def notify_invalidate(cursor, problem_ids):
+    """Tell every worker (via LISTEN/NOTIFY) to evict these problems once the transaction commits"""
+    cursor.execute(SQL_NOTIFY_INVALIDATE, (list(problem_ids),))
 
 def check_admin_token():
     """Check if request has valid admin token"""
     token = request.headers.get('X-Admin-Token')
     return token == ADMIN_PASSWORD
 
-def get_db_connection():
+def prepare_statements(conn):
+    """PREPARE the hot-path statements on a connection the first time a handler needs them"""
+    if conn.prepared:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(PREPARED_STATEMENTS)
+    conn.prepared = True
+
+def get_db_connection(autocommit=False):
     """Get a database connection from pool"""
     try:
         if connection_pool:
-            return connection_pool.getconn()
-        return psycopg2.connect(DATABASE_URL)
+            conn = connection_pool.getconn()
+        else:
+            conn = psycopg2.connect(**DSN_KWARGS)
     except Exception as e:
         print(f"Connection error: {e}")
         return None
+    
+    try:
+        # Set on every checkout since pooled connections are shared by read and write paths
+        conn.autocommit = autocommit
+    except Exception as e:
+        # Typically a pooled connection the server already dropped - discard it rather
+        # than leave it checked out forever
+        print(f"Checkout error: {e}")
+        release_connection(conn, close=True)
+        return None
+    return conn
+
+def release_connection(conn, close=False):
+    """Release connection back to pool (the pool rolls back any open transaction)"""
+    if not conn:
+        return
+    if connection_pool:
+        connection_pool.putconn(conn, close=close)
+    else:
+        conn.close()
 
-def release_connection(conn):
-    """Release connection back to pool"""
-    if connection_pool and conn:
-        connection_pool.putconn(conn)
+class DatabaseUnavailable(Exception):
+    """Raised by db() when no connection can be obtained"""
+
+@contextmanager
+def db(autocommit=False):
+    """Check out a connection for the duration of a with-block and always release it,
+    including on early returns and exceptions.
+    
+    Read-only endpoints pass autocommit=True so psycopg2 doesn't wrap their queries
+    in BEGIN ... ROLLBACK, saving two round-trips per request"""
+    conn = get_db_connection(autocommit)
+    if not conn:
+        raise DatabaseUnavailable('Database connection failed')
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+def listen_for_invalidations():
+    """Background thread: evict problems that any worker changed, so gunicorn worker
+    processes don't serve each other's stale entries until the TTL expires"""
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**LISTEN_DSN_KWARGS)
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(SQL_LISTEN_INVALIDATE)
+            while True:
+                select.select([conn], [], [], 60)
+                conn.poll()  # raises if the connection was dropped
+                while conn.notifies:
+                    invalidate_problem(conn.notifies.pop(0).payload)
+        except Exception as e:
+            print(f"⚠ Warning: Cache invalidation listener failed: {e}")
+            # Notifications may have been missed while disconnected
+            with cache_lock:
+                PROBLEM_CACHE.clear()
+                LIST_CACHE.clear()
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                conn.close()
+
+if DATABASE_URL:
+    threading.Thread(target=listen_for_invalidations, name='cache-invalidation', daemon=True).start()
 
 def get_utc_now():
     """Get current UTC time (timezone-aware)"""
     return datetime.now(timezone.utc)
 
-def make_aware(dt):
-    """Convert naive datetime to UTC-aware datetime"""
-    if dt is None:
-        return None
-    if dt.tzinfo is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt
+def format_problem(result):
+    """Convert a problem row (with samples_json) to the camelCase API shape"""
+    problem_dict = dict(result)
+    problem_dict['samples'] = problem_dict.pop('samples_json')
+    
+    # Rename fields to camelCase for API consistency
+    problem_dict['timeLimit'] = problem_dict.pop('time_limit')
+    problem_dict['memoryLimit'] = problem_dict.pop('memory_limit')
+    problem_dict['vjLink'] = problem_dict.pop('vj_link')
+    return problem_dict
+
+def problem_to_json(result):
+    """Serialize a problem row to JSON text, splicing the raw samples JSON from Postgres in as-is"""
+    problem_dict = format_problem(result)
+    samples_json = problem_dict.pop('samples')
+    body = app.json.dumps(problem_dict)
+    return f'{body[:-1]},"samples":{samples_json}}}'
 
 @app.route('/', methods=['GET'])
 def root():
-    """Root route - serve index.html"""
+    """Root route - serve index.html (WhiteNoise serves /index.html itself, but its index_file
+    redirect drops query strings like ?tab=instructions)"""
     return send_from_directory(FRONTEND_FOLDER, 'index.html')
 
-@app.route('/<path:filename>')
-def serve_static(filename):
-    """Serve static files from frontend folder"""
-    return send_from_directory(FRONTEND_FOLDER, filename)
-
 @app.route('/api/info', methods=['GET'])
 def api_info():
     """API info endpoint"""
@@ -116,35 +543,60 @@ def api_info():
     })
 
 @app.route('/api/problems', methods=['GET'])
-@timeout(5)  # 5 second timeout
 def get_all_problems():
-    """Get all problems (without samples for list view) - CACHED for 30 mins"""
-    # Check cache (valid for 30 minutes = 1800 seconds)
-    if 'all_problems' in cache and (time.time() - cache_timestamp.get('all_problems', 0)) < 1800:
-        return jsonify(cache['all_problems'])
+    """Get all problems (without samples for list view) - CACHED for 1 hour"""
+    cached = cache_get(LIST_CACHE, 'all_problems')
+    if cached is not None:
+        return cached_json_response(cached, PROBLEM_LIST_CACHE_CONTROL)
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with db(autocommit=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(SQL_LIST_PROBLEMS)
+            problems = list(cursor.fetchall())
+        
+        # Cache serialized result
+        entry = serialize_json(problems)
+        cache_set(LIST_CACHE, 'all_problems', entry)
+        
+        return cached_json_response(entry, PROBLEM_LIST_CACHE_CONTROL)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/problems/<problem_id>', methods=['GET'])
+def get_problem(problem_id):
+    """Get a specific problem with samples - CACHED for 1 hour"""
+    cached = cache_get(PROBLEM_CACHE, problem_id)
+    if cached is not None:
+        return cached_json_response(cached)
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT id, title, origin, time_limit, memory_limit FROM problems ORDER BY id")
-        problems = list(cursor.fetchall())
-        cursor.close()
+        with db(autocommit=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            if USE_PREPARED_STATEMENTS:
+                # Prepared once per connection (see PREPARED_STATEMENTS) - skips parse/plan.
+                # Done here rather than at checkout so other endpoints never pay for it
+                try:
+                    prepare_statements(conn)
+                    cursor.execute(SQL_EXECUTE_GET_PROBLEM, (problem_id,))
+                except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.DuplicatePreparedStatement):
+                    # The server session doesn't match what this connection prepared (an
+                    # undetected pooler in between) - re-prepare next time, run it plain now
+                    conn.prepared = False
+                    cursor.execute(SQL_GET_PROBLEM, (problem_id,))
+            else:
+                cursor.execute(SQL_GET_PROBLEM, (problem_id,))
+            result = cursor.fetchone()
         
-        # Cache result
-        cache['all_problems'] = problems
-        cache_timestamp['all_problems'] = time.time()
+        if not result:
+            return jsonify({'error': 'Problem not found'}), 404
+        
+        entry = make_cache_entry(problem_to_json(result))
+        cache_set(PROBLEM_CACHE, problem_id, entry)
         
-        return jsonify(problems)
+        return cached_json_response(entry)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/problems/batch', methods=['GET'])
-@timeout(5)  # 5 second timeout
 def get_problems_batch():
     """Get multiple problems at once (batch fetch) - OPTIMIZED for contest preload"""
     # Get problem IDs from query string: /api/problems/batch?ids=A,B,C,D,E,F,G
@@ -160,63 +612,48 @@ def get_problems_batch():
     if not problem_ids:
         return jsonify([])
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # ✅ OPTIMIZED: Single query for all problems with JOIN and JSON aggregation
-        placeholders = ','.join(['%s'] * len(problem_ids))
-        
-        cursor.execute(f"""
-            SELECT 
-                p.id, p.title, p.origin, p.time_limit, p.memory_limit, 
-                p.statement, p.input, p.output, p.constraints, p.note, p.vj_link,
-                COALESCE(json_agg(
-                    json_build_object('input', s.input, 'output', s.output)
-                    ORDER BY s.id
-                ) FILTER (WHERE s.id IS NOT NULL), '[]'::json) as samples_json
-            FROM problems p
-            LEFT JOIN samples s ON p.id = s.problem_id
-            WHERE p.id IN ({placeholders})
-            GROUP BY p.id, p.title, p.origin, p.time_limit, p.memory_limit,
-                     p.statement, p.input, p.output, p.constraints, p.note, p.vj_link
-            ORDER BY p.id
-        """, problem_ids)
-        
-        results = cursor.fetchall()
-        cursor.close()
-        
-        # Convert results to dicts with camelCase
-        problems = []
-        for result in results:
-            problem_dict = dict(result)
-            problem_dict['samples'] = result['samples_json']
-            del problem_dict['samples_json']
-            
-            # Rename fields to camelCase for API consistency
-            problem_dict['timeLimit'] = problem_dict.pop('time_limit')
-            problem_dict['memoryLimit'] = problem_dict.pop('memory_limit')
-            problem_dict['vjLink'] = problem_dict.pop('vj_link')
-            
-            problems.append(problem_dict)
+        # ✅ OPTIMIZED: Single query for all problems, samples aggregated per problem via LATERAL
+        # (filters problems first, then hits idx_samples_problem_id_id - no wide GROUP BY)
+        with db(autocommit=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(SQL_GET_PROBLEMS_BATCH, (problem_ids,))
+            results = cursor.fetchall()
         
-        return jsonify(problems)
+        # Convert results to camelCase JSON, samples passed through from Postgres
+        body = '[' + ','.join(problem_to_json(result) for result in results) + ']'
+        
+        return Response(body, mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    conn = get_db_connection()
-    if conn:
-        release_connection(conn)
-        return jsonify({'status': 'healthy', 'database': 'connected', 'cache_size': len(cache)})
-    return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+    """Health check endpoint (no query - only checks the pooled connection is still open)"""
+    if HEALTH_POOL is None:
+        try:
+            with db():
+                return jsonify({'status': 'healthy', 'database': 'connected', 'cache_size': len(PROBLEM_CACHE)})
+        except DatabaseUnavailable:
+            return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+    
+    deadline = time.monotonic() + HEALTH_POOL_WAIT
+    while True:
+        try:
+            conn = HEALTH_POOL.getconn()
+            break
+        except pool.PoolError:
+            # Both health connections busy: slow but alive, so don't fail the probe
+            if time.monotonic() >= deadline:
+                return jsonify({'status': 'degraded', 'database': 'busy'})
+            time.sleep(0.01)
+        except psycopg2.Error:
+            return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+    
+    closed = conn.closed != 0
+    HEALTH_POOL.putconn(conn, close=closed)
+    if closed:
+        return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+    return jsonify({'status': 'healthy', 'database': 'connected', 'cache_size': len(PROBLEM_CACHE)})
 
 @app.route('/api/admin/login', methods=['POST'])
 def admin_login():
@@ -230,19 +667,15 @@ def admin_login():
 def test_connection():
     """Test database connection"""
     try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) as count FROM problems")
+        with db(autocommit=True) as conn, conn.cursor() as cursor:
+            cursor.execute(SQL_COUNT_PROBLEMS)
             result = cursor.fetchone()
-            cursor.close()
-            release_connection(conn)
-            
-            return jsonify({
-                'status': 'success',
-                'message': f'Connected to NeonDB. Found {result[0]} problems.',
-                'cache_enabled': True
-            })
+        
+        return jsonify({
+            'status': 'success',
+            'message': f'Connected to NeonDB. Found {result[0]} problems.',
+            'cache_enabled': True
+        })
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -255,17 +688,11 @@ def validate_password():
     data = request.json
     password = data.get('password', '')
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
         # Get contest password from database
-        cursor.execute("SELECT password FROM contest_password WHERE id = 1")
-        result = cursor.fetchone()
-        cursor.close()
+        with db(autocommit=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(SQL_GET_CONTEST_PASSWORD)
+            result = cursor.fetchone()
         
         if not result or not result['password']:
             return jsonify({'error': 'Contest password not configured'}), 400
@@ -277,8 +704,6 @@ def validate_password():
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 # ==================== ADMIN ENDPOINTS ====================
 
@@ -289,58 +714,82 @@ def admin_add_problem():
         return jsonify({'error': 'Unauthorized'}), 401
     
     data = request.json
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        
-        # Insert problem
-        cursor.execute("""
-            INSERT INTO problems (id, title, origin, time_limit, memory_limit, statement, input, output, constraints, note, vj_link)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO UPDATE SET
-                title = EXCLUDED.title,
-                origin = EXCLUDED.origin,
-                time_limit = EXCLUDED.time_limit,
-                memory_limit = EXCLUDED.memory_limit,
-                statement = EXCLUDED.statement,
-                input = EXCLUDED.input,
-                output = EXCLUDED.output,
-                constraints = EXCLUDED.constraints,
-                note = EXCLUDED.note,
-                vj_link = EXCLUDED.vj_link
-        """, (
-            data['id'], data['title'], data.get('origin'), data.get('timeLimit'), 
-            data.get('memoryLimit'), data['statement'], data['input'], data['output'],
-            data['constraints'], data.get('note'), data['vjLink']
-        ))
-        
-        # Delete existing samples for this problem
-        cursor.execute("DELETE FROM samples WHERE problem_id = %s", (data['id'],))
-        
-        # Insert samples (batch)
-        if data.get('samples', []):
-            sample_args = [(data['id'], s['input'], s['output']) for s in data.get('samples', [])]
-            cursor.executemany("""
-                INSERT INTO samples (problem_id, input, output) VALUES (%s, %s, %s)
-            """, sample_args)
-        
-        conn.commit()
-        
-        # Clear cache
-        cache.clear()
-        cache_timestamp.clear()
+        with db() as conn, conn.cursor() as cursor:
+            # Insert problem
+            cursor.execute(SQL_UPSERT_PROBLEM, (
+                data['id'], data['title'], data.get('origin'), data.get('timeLimit'), 
+                data.get('memoryLimit'), data['statement'], data['input'], data['output'],
+                data['constraints'], data.get('note'), data['vjLink']
+            ))
+            
+            # Delete existing samples for this problem
+            cursor.execute(SQL_DELETE_SAMPLES, (data['id'],))
+            
+            # Insert samples (single multi-row INSERT)
+            if data.get('samples', []):
+                sample_args = [(data['id'], s['input'], s['output']) for s in data.get('samples', [])]
+                execute_values(cursor, SQL_INSERT_SAMPLES, sample_args, page_size=100)
+            
+            notify_invalidate(cursor, [data['id']])
+            conn.commit()
+        
+        # Evict only this problem (and the list view)
+        invalidate_problem(data['id'])
         
         return jsonify({'status': 'success', 'message': 'Problem added successfully'})
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        release_connection(conn)
+
+@app.route('/api/admin/problems/bulk', methods=['POST'])
+def admin_bulk_add_problems():
+    """Add or replace many problems at once, e.g. during contest setup (admin only)"""
+    if not check_admin_token():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    problems = request.json
+    if not isinstance(problems, list) or not problems:
+        return jsonify({'error': 'Expected a non-empty list of problems'}), 400
+    if not all(isinstance(p, dict) and isinstance(p.get('id'), str) and p['id'] for p in problems):
+        return jsonify({'error': 'Every problem must be an object with an id'}), 400
+    
+    # ON CONFLICT can't touch the same row twice in one statement - last definition wins
+    problems = list({p['id']: p for p in problems}.values())
+    problem_ids = [p['id'] for p in problems]
+    
+    try:
+        with db() as conn, conn.cursor() as cursor:
+            # Upsert all problems in one statement
+            execute_values(cursor, SQL_UPSERT_PROBLEMS, [(
+                p['id'], p['title'], p.get('origin'), p.get('timeLimit'),
+                p.get('memoryLimit'), p['statement'], p['input'], p['output'],
+                p['constraints'], p.get('note'), p['vjLink']
+            ) for p in problems], page_size=100)
+            
+            # Replace samples for all imported problems
+            cursor.execute(SQL_DELETE_SAMPLES_FOR_PROBLEMS, (problem_ids,))
+            
+            # Stream every sample through COPY - no per-row SQL parsing.
+            # QUOTE_ALL keeps empty strings as '' instead of COPY's unquoted-empty NULL
+            buf = io.StringIO()
+            writer = csv.writer(buf, quoting=csv.QUOTE_ALL, lineterminator='\n')
+            for p in problems:
+                for sample in p.get('samples') or []:
+                    writer.writerow([p['id'], sample['input'], sample['output']])
+            buf.seek(0)
+            cursor.copy_expert(SQL_COPY_SAMPLES, buf)
+            
+            notify_invalidate(cursor, problem_ids)
+            conn.commit()
+        
+        for problem_id in problem_ids:
+            invalidate_problem(problem_id)
+        
+        return jsonify({'status': 'success', 'message': f'{len(problem_ids)} problems imported successfully'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/problems/<problem_id>', methods=['PUT'])
 def admin_update_problem(problem_id):
@@ -349,50 +798,31 @@ def admin_update_problem(problem_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     data = request.json
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        
-        # Update problem
-        cursor.execute("""
-            UPDATE problems SET 
-                title = %s, origin = %s, time_limit = %s, memory_limit = %s,
-                statement = %s, input = %s, output = %s, constraints = %s, 
-                note = %s, vj_link = %s
-            WHERE id = %s
-        """, (
-            data['title'], data.get('origin'), data.get('timeLimit'),
-            data.get('memoryLimit'), data['statement'], data['input'], 
-            data['output'], data['constraints'], data.get('note'), 
-            data['vjLink'], problem_id
-        ))
-        
-        # Delete existing samples and add new ones
-        cursor.execute("DELETE FROM samples WHERE problem_id = %s", (problem_id,))
-        
-        if data.get('samples', []):
-            sample_args = [(problem_id, s['input'], s['output']) for s in data.get('samples', [])]
-            cursor.executemany("""
-                INSERT INTO samples (problem_id, input, output) VALUES (%s, %s, %s)
-            """, sample_args)
-        
-        conn.commit()
-        
-        # Clear cache
-        cache.clear()
-        cache_timestamp.clear()
+        with db() as conn, conn.cursor() as cursor:
+            # Update problem and replace its samples in a single statement
+            samples = data.get('samples') or []
+            cursor.execute(SQL_UPDATE_PROBLEM, (
+                data['title'], data.get('origin'), data.get('timeLimit'),
+                data.get('memoryLimit'), data['statement'], data['input'], 
+                data['output'], data['constraints'], data.get('note'), 
+                data['vjLink'], problem_id,
+                [s['input'] for s in samples], [s['output'] for s in samples]
+            ))
+            found = cursor.fetchone() is not None
+            
+            conn.commit()
+        
+        if not found:
+            return jsonify({'error': 'Problem not found'}), 404
+        
+        # Evict only this problem (and the list view)
+        invalidate_problem(problem_id)
         
         return jsonify({'status': 'success', 'message': 'Problem updated successfully'})
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        release_connection(conn)
 
 @app.route('/api/admin/problems/<problem_id>', methods=['DELETE'])
 def admin_delete_problem(problem_id):
@@ -400,152 +830,79 @@ def admin_delete_problem(problem_id):
     if not check_admin_token():
         return jsonify({'error': 'Unauthorized'}), 401
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        
-        # Delete samples first (foreign key constraint)
-        cursor.execute("DELETE FROM samples WHERE problem_id = %s", (problem_id,))
-        
-        # Delete problem
-        cursor.execute("DELETE FROM problems WHERE id = %s", (problem_id,))
-        
-        conn.commit()
+        with db() as conn, conn.cursor() as cursor:
+            # Delete samples first (foreign key constraint)
+            cursor.execute(SQL_DELETE_SAMPLES, (problem_id,))
+            
+            # Delete problem
+            cursor.execute(SQL_DELETE_PROBLEM, (problem_id,))
+            
+            notify_invalidate(cursor, [problem_id])
+            conn.commit()
         
-        # Clear cache
-        cache.clear()
-        cache_timestamp.clear()
+        # Evict only this problem (and the list view)
+        invalidate_problem(problem_id)
         
         return jsonify({'status': 'success', 'message': 'Problem deleted successfully'})
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        release_connection(conn)
 
 # ==================== CONTEST TIMER ENDPOINTS ====================
 
 @app.route('/api/contest/status', methods=['GET'])
-@timeout(5)  # 5 second timeout for status endpoint
 def get_contest_status():
-    """Get current contest status - READ ONLY, super fast"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    """Get current contest status - READ ONLY, super fast (CACHED for 1 second)"""
+    cached = cache_get(STATUS_CACHE, 'status')
+    if cached is not None:
+        return Response(cached, mimetype='application/json')
     
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT id, status, start_time, end_time, total_duration_minutes, is_visible
-            FROM contest_state WHERE id = 1
-        """)
-        contest = cursor.fetchone()
-        cursor.close()
+        with db(autocommit=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Remaining time is computed DB-side so the clock comes from one source (NOW())
+            cursor.execute(SQL_CONTEST_STATUS)
+            contest = cursor.fetchone()
         
         if not contest:
-            return jsonify({
+            contest = {
                 'status': 'pending',
                 'remaining_time': 0,
                 'is_visible': False,
                 'message': 'No active contest'
-            })
+            }
         
-        contest_dict = dict(contest)
+        body = app.json.dumps(contest).encode('utf-8')
+        cache_set(STATUS_CACHE, 'status', body)
         
-        # Calculate remaining time based on status (NO UPDATES - just calculation)
-        remaining_time = 0
-        now = get_utc_now()
-        
-        if contest_dict['status'] == 'pending' and contest_dict['start_time']:
-            # Pre-contest: Show countdown until contest starts
-            start_time = make_aware(contest_dict['start_time'])
-            remaining = (start_time - now).total_seconds()
-            remaining_time = max(0, int(remaining))
-                
-        elif contest_dict['status'] == 'running' and contest_dict['end_time']:
-            # Contest running: Show countdown until end
-            end_time = make_aware(contest_dict['end_time'])
-            remaining = (end_time - now).total_seconds()
-            remaining_time = max(0, int(remaining))
-        
-        return jsonify({
-            'status': contest_dict['status'],
-            'remaining_time': remaining_time,
-            'is_visible': contest_dict['is_visible'],
-            'total_duration_minutes': contest_dict['total_duration_minutes']
-        })
+        return Response(body, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/contest/last-update', methods=['GET'])
-@timeout(5)  # 5 second timeout for last-update endpoint
 def get_last_update():
     """Get the timestamp of the last contest state update + check auto-transitions"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with db(autocommit=True) as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Read state, decide auto-transition and apply it in ONE round-trip
+            # (pending -> running once start_time passes, running -> ended once end_time passes).
+            # The row is only locked when a transition is due, and SKIP LOCKED means that when
+            # many pollers hit the deadline at once one of them writes while the rest just read.
+            # A single statement is atomic on its own, so autocommit saves the COMMIT/ROLLBACK
+            cursor.execute(SQL_CONTEST_LAST_UPDATE)
+            result = cursor.fetchone()
         
-        # Get current state
-        cursor.execute("""
-            SELECT id, status, start_time, end_time, EXTRACT(EPOCH FROM updated_at) as timestamp
-            FROM contest_state WHERE id = 1
-        """)
-        result = cursor.fetchone()
+        if result['updated']:
+            invalidate_contest_status()
         
-        if not result:
-            cursor.close()
+        if not result['found']:
             return jsonify({
                 'last_update': 0,
                 'status': 'no_contest'
             })
         
-        now = get_utc_now()
         timestamp = int(result['timestamp']) if result['timestamp'] else 0
-        current_status = result['status']
-        
-        # Check for auto-transitions
-        needs_update = False
-        new_status = current_status
-        
-        if current_status == 'pending' and result['start_time']:
-            start_time = make_aware(result['start_time'])
-            if start_time <= now:
-                # Countdown expired, move to running
-                new_status = 'running'
-                needs_update = True
-            
-        elif current_status == 'running' and result['end_time']:
-            end_time = make_aware(result['end_time'])
-            if end_time <= now:
-                # Contest time expired, move to ended
-                new_status = 'ended'
-                needs_update = True
-        
-        # If transition needed, update NOW (this is called every 10s anyway)
-        if needs_update and new_status != current_status:
-            cursor.execute("""
-                UPDATE contest_state 
-                SET status = %s, updated_at = NOW()
-                WHERE id = 1
-                RETURNING EXTRACT(EPOCH FROM updated_at) as timestamp
-            """, (new_status,))
-            conn.commit()
-            # Get the new timestamp from the UPDATE RETURNING clause
-            new_result = cursor.fetchone()
-            timestamp = int(new_result['timestamp']) if new_result['timestamp'] else timestamp
-        
-        cursor.close()
         
         return jsonify({
             'last_update': timestamp,
@@ -555,8 +912,6 @@ def get_last_update():
     except Exception as e:
         print(f"Error in get_last_update: {e}")
         return jsonify({'error': str(e), 'last_update': 0}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/schedule', methods=['POST'])
 def admin_schedule_contest():
@@ -568,43 +923,31 @@ def admin_schedule_contest():
     countdown_minutes = data.get('countdown_minutes', 5)  # When to start showing countdown
     duration_minutes = data.get('duration_minutes', 120)  # How long contest runs
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        now = get_utc_now()
-        
-        # Calculate times
-        # Contest will start after countdown_minutes
-        start_time = now + timedelta(minutes=countdown_minutes)
-        end_time = start_time + timedelta(minutes=duration_minutes)
-        
-        # Use INSERT ... ON CONFLICT to ensure row exists
-        cursor.execute("""
-            INSERT INTO contest_state (id, status, start_time, end_time, total_duration_minutes, is_visible, updated_at)
-            VALUES (1, 'pending', %s, %s, %s, FALSE, NOW())
-            ON CONFLICT (id) DO UPDATE
-            SET status = 'pending', start_time = %s, end_time = %s, 
-                total_duration_minutes = %s, updated_at = NOW()
-        """, (start_time, end_time, duration_minutes, start_time, end_time, duration_minutes))
-        
-        conn.commit()
-        cursor.close()
+        with db() as conn, conn.cursor() as cursor:
+            now = get_utc_now()
+            
+            # Calculate times
+            # Contest will start after countdown_minutes
+            start_time = now + timedelta(minutes=countdown_minutes)
+            end_time = start_time + timedelta(minutes=duration_minutes)
+            
+            # Use INSERT ... ON CONFLICT to ensure row exists
+            cursor.execute(SQL_SCHEDULE_CONTEST, (start_time, end_time, duration_minutes, start_time, end_time, duration_minutes))
+            
+            conn.commit()
+        
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
             'message': f'Contest scheduled. Countdown in {countdown_minutes} minutes, then {duration_minutes} minute contest',
-            'start_time': start_time.isoformat(),
-            'end_time': end_time.isoformat()
+            'start_time': start_time,
+            'end_time': end_time
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/start', methods=['POST'])
 def admin_start_contest():
@@ -615,26 +958,17 @@ def admin_start_contest():
     data = request.json
     duration_minutes = data.get('duration_minutes', 0)
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        now = get_utc_now()
-        end_time = now + timedelta(minutes=duration_minutes)
-        
-        # Use INSERT ... ON CONFLICT to ensure row exists
-        cursor.execute("""
-            INSERT INTO contest_state (id, status, start_time, end_time, total_duration_minutes, is_visible, updated_at)
-            VALUES (1, 'running', %s, %s, %s, FALSE, NOW())
-            ON CONFLICT (id) DO UPDATE
-            SET status = 'running', start_time = %s, end_time = %s, 
-                total_duration_minutes = %s, updated_at = NOW()
-        """, (now, end_time, duration_minutes, now, end_time, duration_minutes))
-        
-        conn.commit()
-        cursor.close()
+        with db() as conn, conn.cursor() as cursor:
+            now = get_utc_now()
+            end_time = now + timedelta(minutes=duration_minutes)
+            
+            # Use INSERT ... ON CONFLICT to ensure row exists
+            cursor.execute(SQL_START_CONTEST, (now, end_time, duration_minutes, now, end_time, duration_minutes))
+            
+            conn.commit()
+        
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
@@ -642,10 +976,7 @@ def admin_start_contest():
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/add-time', methods=['POST'])
 def admin_add_time():
@@ -656,33 +987,24 @@ def admin_add_time():
     data = request.json
     additional_minutes = data.get('minutes', 0)
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Get current contest state
-        cursor.execute("SELECT end_time, total_duration_minutes FROM contest_state WHERE id = 1")
-        contest = cursor.fetchone()
-        
-        if not contest or not contest['end_time']:
-            cursor.close()
-            return jsonify({'error': 'No active contest'}), 400
-        
-        # Add time to end_time
-        new_end_time = contest['end_time'] + timedelta(minutes=additional_minutes)
-        new_duration = contest['total_duration_minutes'] + additional_minutes
-        
-        cursor.execute("""
-            UPDATE contest_state 
-            SET end_time = %s, total_duration_minutes = %s, updated_at = NOW()
-            WHERE id = 1
-        """, (new_end_time, new_duration))
+        with db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Get current contest state
+            cursor.execute(SQL_GET_CONTEST_END)
+            contest = cursor.fetchone()
+            
+            if not contest or not contest['end_time']:
+                return jsonify({'error': 'No active contest'}), 400
+            
+            # Add time to end_time
+            new_end_time = contest['end_time'] + timedelta(minutes=additional_minutes)
+            new_duration = contest['total_duration_minutes'] + additional_minutes
+            
+            cursor.execute(SQL_EXTEND_CONTEST, (new_end_time, new_duration))
+            
+            conn.commit()
         
-        conn.commit()
-        cursor.close()
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
@@ -690,10 +1012,7 @@ def admin_add_time():
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/add-precountdown-time', methods=['POST'])
 def admin_add_precountdown_time():
@@ -704,40 +1023,29 @@ def admin_add_precountdown_time():
     data = request.json
     additional_minutes = data.get('minutes', 0)
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Get current contest state
-        cursor.execute("SELECT status, start_time FROM contest_state WHERE id = 1")
-        contest = cursor.fetchone()
-        
-        if not contest:
-            cursor.close()
-            return jsonify({'error': 'No contest scheduled'}), 400
-        
-        if contest['status'] != 'pending':
-            cursor.close()
-            return jsonify({'error': 'Can only add time during pre-countdown phase'}), 400
-        
-        if not contest['start_time']:
-            cursor.close()
-            return jsonify({'error': 'No start time set'}), 400
-        
-        # Add time to start_time (delay the contest start)
-        new_start_time = contest['start_time'] + timedelta(minutes=additional_minutes)
-        
-        cursor.execute("""
-            UPDATE contest_state 
-            SET start_time = %s, updated_at = NOW()
-            WHERE id = 1
-        """, (new_start_time,))
+        with db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Get current contest state
+            cursor.execute(SQL_GET_CONTEST_START)
+            contest = cursor.fetchone()
+            
+            if not contest:
+                return jsonify({'error': 'No contest scheduled'}), 400
+            
+            if contest['status'] != 'pending':
+                return jsonify({'error': 'Can only add time during pre-countdown phase'}), 400
+            
+            if not contest['start_time']:
+                return jsonify({'error': 'No start time set'}), 400
+            
+            # Add time to start_time (delay the contest start)
+            new_start_time = contest['start_time'] + timedelta(minutes=additional_minutes)
+            
+            cursor.execute(SQL_DELAY_CONTEST_START, (new_start_time,))
+            
+            conn.commit()
         
-        conn.commit()
-        cursor.close()
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
@@ -745,10 +1053,7 @@ def admin_add_precountdown_time():
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/stop', methods=['POST'])
 def admin_stop_contest():
@@ -756,22 +1061,14 @@ def admin_stop_contest():
     if not check_admin_token():
         return jsonify({'error': 'Unauthorized'}), 401
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        # Use INSERT ... ON CONFLICT to ensure row exists
-        cursor.execute("""
-            INSERT INTO contest_state (id, status, end_time, updated_at)
-            VALUES (1, 'ended', NOW(), NOW())
-            ON CONFLICT (id) DO UPDATE
-            SET status = 'ended', end_time = NOW(), updated_at = NOW()
-        """)
-        
-        conn.commit()
-        cursor.close()
+        with db() as conn, conn.cursor() as cursor:
+            # Use INSERT ... ON CONFLICT to ensure row exists
+            cursor.execute(SQL_STOP_CONTEST)
+            
+            conn.commit()
+        
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
@@ -779,10 +1076,7 @@ def admin_stop_contest():
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/visibility', methods=['POST'])
 def admin_toggle_visibility():
@@ -793,22 +1087,14 @@ def admin_toggle_visibility():
     data = request.json
     is_visible = data.get('is_visible', False)
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        # Use INSERT ... ON CONFLICT to ensure row exists
-        cursor.execute("""
-            INSERT INTO contest_state (id, is_visible, updated_at)
-            VALUES (1, %s, NOW())
-            ON CONFLICT (id) DO UPDATE
-            SET is_visible = %s, updated_at = NOW()
-        """, (is_visible, is_visible))
-        
-        conn.commit()
-        cursor.close()
+        with db() as conn, conn.cursor() as cursor:
+            # Use INSERT ... ON CONFLICT to ensure row exists
+            cursor.execute(SQL_SET_CONTEST_VISIBILITY, (is_visible, is_visible))
+            
+            conn.commit()
+        
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
@@ -816,10 +1102,7 @@ def admin_toggle_visibility():
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 @app.route('/api/admin/contest/reset', methods=['POST'])
 def admin_reset_contest():
@@ -827,23 +1110,14 @@ def admin_reset_contest():
     if not check_admin_token():
         return jsonify({'error': 'Unauthorized'}), 401
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        # Use INSERT ... ON CONFLICT to ensure row exists and gets reset
-        cursor.execute("""
-            INSERT INTO contest_state (id, status, start_time, end_time, total_duration_minutes, is_visible, updated_at)
-            VALUES (1, 'pending', NULL, NULL, 0, FALSE, NOW())
-            ON CONFLICT (id) DO UPDATE
-            SET status = 'pending', start_time = NULL, end_time = NULL, 
-                total_duration_minutes = 0, is_visible = FALSE, updated_at = NOW()
-        """)
-        
-        conn.commit()
-        cursor.close()
+        with db() as conn, conn.cursor() as cursor:
+            # Use INSERT ... ON CONFLICT to ensure row exists and gets reset
+            cursor.execute(SQL_RESET_CONTEST)
+            
+            conn.commit()
+        
+        invalidate_contest_status()
         
         return jsonify({
             'status': 'success',
@@ -851,10 +1125,7 @@ def admin_reset_contest():
         })
         
     except Exception as e:
-        conn.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        release_connection(conn)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
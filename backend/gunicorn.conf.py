@@ -0,0 +1,21 @@
+"""
+Gunicorn config for the Flask backend (loaded automatically when started from backend/)
+"""
+import os
+from dotenv import load_dotenv
+
+# Gunicorn reads this file before app.py runs, so load backend/.env here too - otherwise a
+# DB_POOL_MAX set only in .env would size the pool but not the thread count below
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+# Threaded workers: psycopg2 releases the GIL while waiting on NeonDB, so concurrent
+# /api/contest/* polls overlap their round-trips instead of queueing behind each other
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+# One thread per pooled connection - ThreadedConnectionPool raises instead of waiting
+# when exhausted, so never run more threads than DB_POOL_MAX
+threads = int(os.getenv('DB_POOL_MAX', 25))
+
+# Reuse client connections between the 10-second polls instead of reconnecting each time
+keepalive = 30
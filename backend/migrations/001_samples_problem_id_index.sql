@@ -0,0 +1,7 @@
+-- Index samples by problem so per-problem sample lookups (get_problem, batch fetch)
+-- are index scans instead of sequential scans over every sample row.
+-- The (problem_id, id) composite also serves the ORDER BY id inside json_agg,
+-- and covers plain problem_id lookups, so no separate single-column index is needed.
+--
+-- Apply with: psql "$DATABASE_URL" -f backend/migrations/001_samples_problem_id_index.sql
+CREATE INDEX IF NOT EXISTS idx_samples_problem_id_id ON samples (problem_id, id);
@@ -329,7 +329,8 @@ async function saveProblem() {
 // Load problems for management
 async function loadProblemsForManagement() {
     try {
-        const response = await fetch(`${API_URL}/problems`);
+        // The list is browser-cacheable for a minute; revalidate so edits show up right away
+        const response = await fetch(`${API_URL}/problems`, { cache: 'no-cache' });
         if (!response.ok) throw new Error('Failed to load problems');
         
         const problems = await response.json();